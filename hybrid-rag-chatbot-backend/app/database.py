@@ -1,7 +1,15 @@
 # app/database.py
 import aiosqlite
+import asyncio
 import os
+from contextlib import asynccontextmanager
 from pathlib import Path
+from typing import List, Optional
+from dotenv import load_dotenv
+
+# Settings below are read at import time, which happens before main.py
+# loads .env, so load it here too
+load_dotenv()
 
 
 # Database path
@@ -12,80 +20,215 @@ DB_PATH = Path(__file__).parent.parent / "data" / "chat_history.db"
 DB_PATH.parent.mkdir(parents=True, exist_ok=True)
 
 
+# Number of pooled read connections (a single dedicated writer is kept on top)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
 
-async def get_db():
-    """Get database connection"""
+
+# Database-level PRAGMAs (persisted in the DB file, set once in init_db)
+DATABASE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA journal_size_limit=6144000",
+)
+
+# Connection-scoped PRAGMAs (must be re-applied on every new connection)
+CONNECTION_PRAGMAS = (
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-64000",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA foreign_keys=ON",
+)
+
+
+# Schema DDL
+TABLES_SQL = """
+-- Chats table
+CREATE TABLE IF NOT EXISTS chats (
+    id TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    pinned INTEGER DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Messages table
+CREATE TABLE IF NOT EXISTS messages (
+    id TEXT PRIMARY KEY,
+    chat_id TEXT NOT NULL,
+    type TEXT NOT NULL CHECK(type IN ('user', 'bot')),
+    content TEXT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (chat_id) REFERENCES chats(id) ON DELETE CASCADE
+);
+
+-- Files table (chat-linked files)
+CREATE TABLE IF NOT EXISTS files (
+    id TEXT PRIMARY KEY,
+    chat_id TEXT,
+    filename TEXT NOT NULL,
+    original_filename TEXT NOT NULL,
+    file_path TEXT NOT NULL,
+    file_size INTEGER,
+    file_type TEXT,
+    category TEXT CHECK(category IN ('purchase', 'hr', 'finance', 'other')),
+    uploaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (chat_id) REFERENCES chats(id) ON DELETE SET NULL
+);
+
+-- Uploaded Files table (independent from chats)
+CREATE TABLE IF NOT EXISTS uploaded_files (
+    id TEXT PRIMARY KEY,
+    filename TEXT NOT NULL,
+    original_filename TEXT NOT NULL,
+    file_path TEXT NOT NULL,
+    file_size INTEGER NOT NULL,
+    file_type TEXT NOT NULL,
+    category TEXT NOT NULL CHECK(category IN ('purchase', 'hr', 'finance', 'other')),
+    uploaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    description TEXT
+);
+"""
+
+# Indexes for the ORDER BY / WHERE patterns used by the routes
+INDEXES_SQL = """
+CREATE INDEX IF NOT EXISTS idx_messages_chat_created ON messages(chat_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_uploaded_files_cat_time ON uploaded_files(category, uploaded_at DESC);
+CREATE INDEX IF NOT EXISTS idx_files_chat_time ON files(chat_id, uploaded_at DESC);
+CREATE INDEX IF NOT EXISTS idx_chats_updated ON chats(updated_at DESC);
+"""
+
+SCHEMA_SQL = TABLES_SQL + INDEXES_SQL
+
+# Tables created by TABLES_SQL (used to skip the DDL on warm starts)
+SCHEMA_TABLES = ("chats", "messages", "files", "uploaded_files")
+
+
+
+async def _apply_pragmas(db: aiosqlite.Connection, pragmas):
+    """Run a sequence of PRAGMA statements on a connection"""
+    for pragma in pragmas:
+        await db.execute(pragma)
+
+
+
+async def _tables_exist(db: aiosqlite.Connection) -> bool:
+    """Check whether every schema table is already present"""
+    placeholders = ", ".join("?" for _ in SCHEMA_TABLES)
+    cursor = await db.execute(
+        f"SELECT count(*) FROM sqlite_master WHERE type = 'table' AND name IN ({placeholders})",
+        SCHEMA_TABLES
+    )
+    row = await cursor.fetchone()
+    return row[0] == len(SCHEMA_TABLES)
+
+
+
+async def _connect() -> aiosqlite.Connection:
+    """Open a new connection with row_factory and PRAGMAs applied"""
     db = await aiosqlite.connect(DB_PATH)
     db.row_factory = aiosqlite.Row
-    try:
+    await _apply_pragmas(db, CONNECTION_PRAGMAS)
+    return db
+
+
+
+class ConnectionPool:
+    """Long-lived aiosqlite connections: N readers + one dedicated writer"""
+    
+    def __init__(self, size: int):
+        self.size = size
+        self._readers: Optional[asyncio.Queue] = None
+        self._writer: Optional[asyncio.Queue] = None
+        self._connections: List[aiosqlite.Connection] = []
+    
+    async def open(self):
+        """Pre-warm reader and writer connections"""
+        self._readers = asyncio.Queue()
+        for _ in range(self.size):
+            conn = await _connect()
+            self._connections.append(conn)
+            self._readers.put_nowait(conn)
+        
+        # WAL lets readers run concurrently with the single writer
+        self._writer = asyncio.Queue(maxsize=1)
+        conn = await _connect()
+        self._connections.append(conn)
+        self._writer.put_nowait(conn)
+    
+    async def close(self):
+        """Close every pooled connection"""
+        for conn in self._connections:
+            await conn.close()
+        self._connections.clear()
+        self._readers = None
+        self._writer = None
+    
+    @asynccontextmanager
+    async def reader(self):
+        """Borrow a read connection"""
+        conn = await self._readers.get()
+        try:
+            yield conn
+        finally:
+            self._readers.put_nowait(conn)
+    
+    @asynccontextmanager
+    async def writer(self):
+        """Borrow the read-write connection (exclusive)"""
+        conn = await self._writer.get()
+        try:
+            yield conn
+        finally:
+            # Never hand an open transaction to the next borrower
+            if conn.in_transaction:
+                await conn.rollback()
+            self._writer.put_nowait(conn)
+
+
+# Global connection pool (opened in init_db, closed in close_db)
+db_pool = ConnectionPool(DB_POOL_SIZE)
+
+
+
+async def get_db():
+    """Get pooled read connection"""
+    async with db_pool.reader() as db:
+        yield db
+
+
+
+async def get_write_db():
+    """Get pooled read-write connection"""
+    async with db_pool.writer() as db:
         yield db
-    finally:
-        await db.close()
 
 
 
 async def init_db():
     """Initialize database tables"""
+    # Checked before connecting, since connecting creates the file
+    db_exists = DB_PATH.exists()
+    
     async with aiosqlite.connect(DB_PATH) as db:
-        # Chats table
-        await db.execute("""
-            CREATE TABLE IF NOT EXISTS chats (
-                id TEXT PRIMARY KEY,
-                title TEXT NOT NULL,
-                pinned INTEGER DEFAULT 0,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        
-        # Messages table
-        await db.execute("""
-            CREATE TABLE IF NOT EXISTS messages (
-                id TEXT PRIMARY KEY,
-                chat_id TEXT NOT NULL,
-                type TEXT NOT NULL CHECK(type IN ('user', 'bot')),
-                content TEXT NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (chat_id) REFERENCES chats(id) ON DELETE CASCADE
-            )
-        """)
-        
-        # Files table (chat-linked files)
-        await db.execute("""
-            CREATE TABLE IF NOT EXISTS files (
-                id TEXT PRIMARY KEY,
-                chat_id TEXT,
-                filename TEXT NOT NULL,
-                original_filename TEXT NOT NULL,
-                file_path TEXT NOT NULL,
-                file_size INTEGER,
-                file_type TEXT,
-                category TEXT CHECK(category IN ('purchase', 'hr', 'finance', 'other')),
-                uploaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (chat_id) REFERENCES chats(id) ON DELETE SET NULL
-            )
-        """)
+        # WAL mode + tuned sync/cache settings
+        await _apply_pragmas(db, DATABASE_PRAGMAS + CONNECTION_PRAGMAS)
         
-        # ✅ NEW: Uploaded Files table (independent from chats)
-        await db.execute("""
-            CREATE TABLE IF NOT EXISTS uploaded_files (
-                id TEXT PRIMARY KEY,
-                filename TEXT NOT NULL,
-                original_filename TEXT NOT NULL,
-                file_path TEXT NOT NULL,
-                file_size INTEGER NOT NULL,
-                file_type TEXT NOT NULL,
-                category TEXT NOT NULL CHECK(category IN ('purchase', 'hr', 'finance', 'other')),
-                uploaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                description TEXT
-            )
-        """)
+        # Warm start: tables already exist, only make sure indexes do
+        if db_exists and await _tables_exist(db):
+            await db.executescript(INDEXES_SQL)
+        else:
+            # Tables + indexes in a single round-trip
+            await db.executescript(SCHEMA_SQL)
         
         await db.commit()
         print("✅ Database initialized successfully!")
+    
+    await db_pool.open()
+    print(f"✅ Connection pool ready ({DB_POOL_SIZE} readers + 1 writer)")
 
 
 
 async def close_db():
-    """Close database connection"""
-    pass  # aiosqlite handles connection closing automatically
+    """Close database connections"""
+    await db_pool.close()
@@ -3,24 +3,35 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
 import os
+import time
 from dotenv import load_dotenv
 
 from app.database import init_db, close_db
 from app.routes import chat, files
 
 # ✏️ CHANGE #1: Import RAG status function
-from app.services.rag_service import get_rag_status, initialize_rag_system
+from app.services.rag_service import get_rag_status, initialize_rag_system, shutdown_rag_system
+from models.data.loader import shutdown_process_pool
 
 # Load environment variables
 load_dotenv()
 
+# Worker threads behind asyncio.to_thread (planner, analytics, embeddings);
+# the asyncio default of cpu_count+4 saturates quickly under concurrent queries
+THREAD_POOL_SIZE = int(os.getenv("THREAD_POOL_SIZE", "64"))
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Startup and shutdown events"""
     # Startup
     print("🚀 Starting ARG Supply Tech Chatbot API...")
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=THREAD_POOL_SIZE)
+    )
     await init_db()
     print("✅ Database ready!")
     
@@ -36,7 +47,9 @@ async def lifespan(app: FastAPI):
     
     # Shutdown
     print("👋 Shutting down...")
+    await shutdown_rag_system()
     await close_db()
+    shutdown_process_pool()
 
 
 # Create FastAPI app
@@ -59,6 +72,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Lets the browser read the stored message ID of streamed replies
+    expose_headers=["X-Message-Id"],
 )
 
 # Include routers
@@ -77,11 +92,28 @@ async def root():
     }
 
 
+# Cached RAG status so frequent /health probes don't touch RAG internals
+HEALTH_CACHE_TTL = 2.0
+_rag_status_cache = (float("-inf"), None)
+
+
+def _cached_rag_status():
+    """Return RAG status, refreshed at most every HEALTH_CACHE_TTL seconds"""
+    global _rag_status_cache
+    
+    now = time.monotonic()
+    ts, status = _rag_status_cache
+    if status is None or now - ts >= HEALTH_CACHE_TTL:
+        status = get_rag_status()
+        _rag_status_cache = (now, status)
+    return status
+
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
-    # ✏️ CHANGE #3: Get RAG system status
-    rag_status = get_rag_status()
+    # ✏️ CHANGE #3: Get RAG system status (cached)
+    rag_status = _cached_rag_status()
     
     return {
         "status": "healthy",
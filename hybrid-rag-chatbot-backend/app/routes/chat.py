@@ -1,11 +1,14 @@
 # app/routes/chat.py
 
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from datetime import datetime
 import aiosqlite
-from typing import List
+import asyncio
+import uuid
+from typing import List, Optional
 
-from app.database import get_db
+from app.database import get_db, get_write_db, db_pool
 from app.models import (
     ChatCreate, ChatResponse, ChatUpdate,
     MessageCreate, MessageResponse,
@@ -14,26 +17,47 @@ from app.models import (
 )
 
 # ✏️ CHANGE #1: Import RAG service instead of Groq
-from app.services.rag_service import get_rag_response
+from app.services.rag_service import get_rag_response, stream_rag_response, RAG_ERROR_MESSAGE
 
 router = APIRouter(prefix="/chat", tags=["Chat"])
 
 
+# Columns needed to build a ChatResponse
+CHAT_COLUMNS = "id, title, pinned, created_at, updated_at"
+
+# Chat and message queries
+INSERT_CHAT_SQL = f"INSERT INTO chats (id, title, pinned) VALUES (?, ?, ?) RETURNING {CHAT_COLUMNS}"
+SELECT_CHAT_SQL = f"SELECT {CHAT_COLUMNS} FROM chats WHERE id = ?"
+SELECT_CHATS_SQL = f"SELECT {CHAT_COLUMNS} FROM chats ORDER BY updated_at DESC"
+DELETE_CHAT_SQL = "DELETE FROM chats WHERE id = ?"
+SELECT_MESSAGES_SQL = (
+    "SELECT id, chat_id, type, content, created_at FROM messages "
+    "WHERE chat_id = ? ORDER BY created_at ASC, rowid ASC"
+)
+# Last 9 stored turns + the in-flight user turn = 10 messages of context
+SELECT_HISTORY_SQL = (
+    "SELECT type, content FROM messages WHERE chat_id = ? "
+    "ORDER BY created_at DESC, rowid DESC LIMIT 9"
+)
+INSERT_MESSAGE_SQL = "INSERT INTO messages (id, chat_id, type, content) VALUES (?, ?, ?, ?)"
+UPDATE_CHAT_TIMESTAMP_SQL = "UPDATE chats SET updated_at = CURRENT_TIMESTAMP WHERE id = ?"
+
+# Saves for aborted streams run detached from the cancelled response;
+# keep references so they aren't garbage-collected mid-write
+_detached_saves = set()
+
+
 @router.post("/create", response_model=ChatResponse)
-async def create_chat(chat: ChatCreate, db: aiosqlite.Connection = Depends(get_db)):
+async def create_chat(chat: ChatCreate, db: aiosqlite.Connection = Depends(get_write_db)):
     """Create a new chat"""
     try:
-        await db.execute(
-            "INSERT INTO chats (id, title, pinned) VALUES (?, ?, ?)",
-            (chat.id, chat.title, int(chat.pinned))
-        )
-        await db.commit()
-        
-        # Fetch created chat
+        # Insert and fetch server-side timestamps in one round-trip
         cursor = await db.execute(
-            "SELECT * FROM chats WHERE id = ?", (chat.id,)
+            INSERT_CHAT_SQL,
+            (chat.id, chat.title, int(chat.pinned))
         )
         row = await cursor.fetchone()
+        await db.commit()
         
         return ChatResponse(
             id=row["id"],
@@ -49,9 +73,7 @@ async def create_chat(chat: ChatCreate, db: aiosqlite.Connection = Depends(get_d
 @router.get("/list", response_model=List[ChatResponse])
 async def list_chats(db: aiosqlite.Connection = Depends(get_db)):
     """Get all chats"""
-    cursor = await db.execute(
-        "SELECT * FROM chats ORDER BY updated_at DESC"
-    )
+    cursor = await db.execute(SELECT_CHATS_SQL)
     rows = await cursor.fetchall()
     
     return [
@@ -69,9 +91,7 @@ async def list_chats(db: aiosqlite.Connection = Depends(get_db)):
 @router.get("/{chat_id}", response_model=ChatResponse)
 async def get_chat(chat_id: str, db: aiosqlite.Connection = Depends(get_db)):
     """Get specific chat"""
-    cursor = await db.execute(
-        "SELECT * FROM chats WHERE id = ?", (chat_id,)
-    )
+    cursor = await db.execute(SELECT_CHAT_SQL, (chat_id,))
     row = await cursor.fetchone()
     
     if not row:
@@ -90,7 +110,7 @@ async def get_chat(chat_id: str, db: aiosqlite.Connection = Depends(get_db)):
 async def update_chat(
     chat_id: str,
     chat_update: ChatUpdate,
-    db: aiosqlite.Connection = Depends(get_db)
+    db: aiosqlite.Connection = Depends(get_write_db)
 ):
     """Update chat (title, pinned status)"""
     updates = []
@@ -107,17 +127,27 @@ async def update_chat(
     updates.append("updated_at = CURRENT_TIMESTAMP")
     params.append(chat_id)
     
-    query = f"UPDATE chats SET {', '.join(updates)} WHERE id = ?"
-    await db.execute(query, params)
+    query = f"UPDATE chats SET {', '.join(updates)} WHERE id = ? RETURNING {CHAT_COLUMNS}"
+    cursor = await db.execute(query, params)
+    row = await cursor.fetchone()
     await db.commit()
     
-    return await get_chat(chat_id, db)
+    if not row:
+        raise HTTPException(status_code=404, detail="Chat not found")
+    
+    return ChatResponse(
+        id=row["id"],
+        title=row["title"],
+        pinned=bool(row["pinned"]),
+        created_at=row["created_at"],
+        updated_at=row["updated_at"]
+    )
 
 
 @router.delete("/{chat_id}", response_model=SuccessResponse)
-async def delete_chat(chat_id: str, db: aiosqlite.Connection = Depends(get_db)):
+async def delete_chat(chat_id: str, db: aiosqlite.Connection = Depends(get_write_db)):
     """Delete chat and all its messages"""
-    await db.execute("DELETE FROM chats WHERE id = ?", (chat_id,))
+    await db.execute(DELETE_CHAT_SQL, (chat_id,))
     await db.commit()
     
     return SuccessResponse(
@@ -132,10 +162,7 @@ async def get_chat_messages(
     db: aiosqlite.Connection = Depends(get_db)
 ):
     """Get all messages for a chat"""
-    cursor = await db.execute(
-        "SELECT * FROM messages WHERE chat_id = ? ORDER BY created_at ASC",
-        (chat_id,)
-    )
+    cursor = await db.execute(SELECT_MESSAGES_SQL, (chat_id,))
     rows = await cursor.fetchall()
     
     return [
@@ -150,53 +177,64 @@ async def get_chat_messages(
     ]
 
 
-@router.post("/message", response_model=ChatMessageResponse)
-async def send_message(
-    request: ChatRequest,
-    db: aiosqlite.Connection = Depends(get_db)
+async def _load_chat_history(chat_id: str, user_message: str) -> list:
+    """Recent chat history for context, ending with the in-flight user turn"""
+    # Newest-first + LIMIT, flipped back to chronological order. The user
+    # turn is appended in memory and written together with the bot reply.
+    # The read connection is borrowed only for this query, never across
+    # the LLM call, so slow answers don't drain the reader pool.
+    async with db_pool.reader() as db:
+        cursor = await db.execute(SELECT_HISTORY_SQL, (chat_id,))
+        history_rows = await cursor.fetchall()
+    
+    chat_history = [
+        {"type": row["type"], "content": row["content"]}
+        for row in reversed(history_rows)
+    ]
+    chat_history.append({"type": "user", "content": user_message})
+    return chat_history
+
+
+async def _save_exchange(
+    chat_id: str,
+    user_msg_id: str,
+    user_message: str,
+    bot_msg_id: str,
+    bot_response: Optional[str]
 ):
+    """Save both messages + bump chat timestamp in a single transaction"""
+    # bot_response is None when the reply never completed: keep the user turn
+    messages = [(user_msg_id, chat_id, "user", user_message)]
+    if bot_response is not None:
+        messages.append((bot_msg_id, chat_id, "bot", bot_response))
+    
+    async with db_pool.writer() as write_db:
+        await write_db.execute("BEGIN IMMEDIATE")
+        await write_db.executemany(INSERT_MESSAGE_SQL, messages)
+        
+        # Update chat timestamp
+        await write_db.execute(UPDATE_CHAT_TIMESTAMP_SQL, (chat_id,))
+        
+        await write_db.commit()
+
+
+@router.post("/message", response_model=ChatMessageResponse)
+async def send_message(request: ChatRequest):
     """Send message and get bot response"""
     try:
         chat_id = request.chat_id
         user_message = request.message
         
         # Generate message IDs
-        user_msg_id = f"msg_{datetime.now().timestamp()}"
-        bot_msg_id = f"msg_{datetime.now().timestamp() + 1}"
+        user_msg_id = f"msg_{uuid.uuid4().hex}"
+        bot_msg_id = f"msg_{uuid.uuid4().hex}"
         
-        # Save user message
-        await db.execute(
-            "INSERT INTO messages (id, chat_id, type, content) VALUES (?, ?, ?, ?)",
-            (user_msg_id, chat_id, "user", user_message)
-        )
-        
-        # Get chat history for context
-        cursor = await db.execute(
-            "SELECT type, content FROM messages WHERE chat_id = ? ORDER BY created_at ASC",
-            (chat_id,)
-        )
-        history_rows = await cursor.fetchall()
-        chat_history = [
-            {"type": row["type"], "content": row["content"]}
-            for row in history_rows
-        ]
+        chat_history = await _load_chat_history(chat_id, user_message)
         
         # ✏️ CHANGE #2: Call RAG service instead of Groq
         bot_response = await get_rag_response(user_message, chat_history)
         
-        # Save bot message
-        await db.execute(
-            "INSERT INTO messages (id, chat_id, type, content) VALUES (?, ?, ?, ?)",
-            (bot_msg_id, chat_id, "bot", bot_response)
-        )
-        
-        # Update chat timestamp
-        await db.execute(
-            "UPDATE chats SET updated_at = CURRENT_TIMESTAMP WHERE id = ?",
-            (chat_id,)
-        )
-        
-        await db.commit()
+        await _save_exchange(chat_id, user_msg_id, user_message, bot_msg_id, bot_response)
         
         return ChatMessageResponse(
             message_id=bot_msg_id,
@@ -209,15 +247,62 @@ async def send_message(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/message/stream")
+async def stream_message(request: ChatRequest):
+    """Send message and stream the bot response as it is generated"""
+    chat_id = request.chat_id
+    user_message = request.message
+    
+    user_msg_id = f"msg_{uuid.uuid4().hex}"
+    bot_msg_id = f"msg_{uuid.uuid4().hex}"
+    
+    try:
+        chat_history = await _load_chat_history(chat_id, user_message)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    async def token_stream():
+        tokens = []
+        bot_response = None
+        try:
+            try:
+                async for token in stream_rag_response(user_message, chat_history):
+                    tokens.append(token)
+                    yield token
+                bot_response = "".join(tokens).strip()
+            except Exception:
+                # Store just the apology, not a truncated answer
+                bot_response = RAG_ERROR_MESSAGE
+                yield ("\n\n" if tokens else "") + RAG_ERROR_MESSAGE
+        except BaseException:
+            # Client disconnected: keep the user turn (and the reply if it
+            # was complete). The response is being cancelled, so the write
+            # runs detached instead of being awaited here.
+            task = asyncio.create_task(
+                _save_exchange(chat_id, user_msg_id, user_message, bot_msg_id, bot_response)
+            )
+            _detached_saves.add(task)
+            task.add_done_callback(_detached_saves.discard)
+            raise
+        
+        await _save_exchange(chat_id, user_msg_id, user_message, bot_msg_id, bot_response)
+    
+    return StreamingResponse(
+        token_stream(),
+        media_type="text/plain; charset=utf-8",
+        headers={"X-Message-Id": bot_msg_id}
+    )
+
+
 @router.post("/message/save", response_model=SuccessResponse)
 async def save_message(
     message: MessageCreate,
-    db: aiosqlite.Connection = Depends(get_db)
+    db: aiosqlite.Connection = Depends(get_write_db)
 ):
     """Save a message (used by frontend)"""
     try:
         await db.execute(
-            "INSERT INTO messages (id, chat_id, type, content) VALUES (?, ?, ?, ?)",
+            INSERT_MESSAGE_SQL,
             (message.id, message.chat_id, message.type, message.content)
         )
         await db.commit()
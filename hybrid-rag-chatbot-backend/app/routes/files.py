@@ -1,14 +1,17 @@
 # app/routes/files.py
 
-from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, Form
+from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, Form, BackgroundTasks
 from pathlib import Path
+import os
 import aiosqlite
+import aiofiles
+import asyncio
 from datetime import datetime
-import shutil
 import uuid
 from typing import Optional
+from dotenv import load_dotenv
 
-from app.database import get_db
+from app.database import get_db, db_pool
 from app.models import (
     FileUploadResponse,
     SuccessResponse,
@@ -23,29 +26,98 @@ from app.services.rag_service import rebuild_rag_system
 
 router = APIRouter(prefix="/files", tags=["Files"])
 
+# MAX_UPLOAD_MB below must come from .env regardless of import order
+load_dotenv()
+
 # Upload directory
 UPLOAD_DIR = Path(__file__).parent.parent.parent / "data" / "uploads"
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 
+# Accepted upload types
+ALLOWED_EXTS = frozenset({".xlsx", ".xls", ".csv"})
+INVALID_FILE_TYPE_DETAIL = "Invalid file type. Allowed: .xlsx, .xls, .csv"
+
+# Chunk size for streaming uploads to disk + hard cap on upload size
+UPLOAD_CHUNK_SIZE = 1 << 20
+MAX_UPLOAD_SIZE = int(os.getenv("MAX_UPLOAD_MB", "50")) * 1024 * 1024
+
+# Category uploads (uploaded_files table)
+INSERT_UPLOADED_FILE_SQL = """INSERT INTO uploaded_files 
+    (id, filename, original_filename, file_path, file_size, file_type, category, description)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)"""
+# Columns needed to build a FileListItem
+UPLOADED_FILE_COLUMNS = (
+    "id, filename, original_filename, file_size, file_type, category, uploaded_at, description"
+)
+SELECT_UPLOADED_FILES_SQL = (
+    f"SELECT {UPLOADED_FILE_COLUMNS} FROM uploaded_files ORDER BY uploaded_at DESC"
+)
+SELECT_UPLOADED_FILES_BY_CATEGORY_SQL = (
+    f"SELECT {UPLOADED_FILE_COLUMNS} FROM uploaded_files WHERE category = ? ORDER BY uploaded_at DESC"
+)
+DELETE_UPLOADED_FILE_SQL = (
+    "DELETE FROM uploaded_files WHERE id = ? RETURNING file_path, original_filename"
+)
+
+# Legacy chat-linked files
+INSERT_FILE_SQL = """INSERT INTO files 
+    (id, chat_id, filename, file_path, file_size, file_type)
+    VALUES (?, ?, ?, ?, ?, ?)"""
+SELECT_CHAT_FILES_SQL = (
+    "SELECT id, filename, file_size, file_type, uploaded_at FROM files WHERE chat_id = ? ORDER BY uploaded_at DESC"
+)
+DELETE_FILE_SQL = "DELETE FROM files WHERE id = ? RETURNING file_path"
+
+
+async def _remove_file(file_path: Path) -> bool:
+    """Delete a file off the event loop, returns True if it existed"""
+    try:
+        await asyncio.to_thread(file_path.unlink)
+        return True
+    except FileNotFoundError:
+        return False
+
+
+async def _save_upload(file: UploadFile, file_path: Path) -> int:
+    """Stream an upload to disk in chunks, returns bytes written"""
+    file_size = 0
+    too_large = False
+    async with aiofiles.open(file_path, "wb") as out:
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            file_size += len(chunk)
+            if file_size > MAX_UPLOAD_SIZE:
+                too_large = True
+                break
+            await out.write(chunk)
+    
+    if too_large:
+        # Drop the partial file
+        await _remove_file(file_path)
+        raise HTTPException(
+            status_code=413,
+            detail=f"File too large. Maximum size: {MAX_UPLOAD_SIZE // (1024 * 1024)} MB"
+        )
+    
+    return file_size
+
 
 # ✅ NEW: Upload file with category (independent from chat)
 @router.post("/upload-category", response_model=CategoryFileUploadResponse)
 async def upload_file_with_category(
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     category: FileCategory = Form(...),
-    description: Optional[str] = Form(None),
-    db: aiosqlite.Connection = Depends(get_db)
+    description: Optional[str] = Form(None)
 ):
     """Upload Excel/CSV file with category"""
     try:
         # Validate file type
-        allowed_extensions = [".xlsx", ".xls", ".csv"]
-        file_ext = Path(file.filename).suffix.lower()
+        file_ext = os.path.splitext(file.filename)[1].lower()
         
-        if file_ext not in allowed_extensions:
+        if file_ext not in ALLOWED_EXTS:
             raise HTTPException(
                 status_code=400,
-                detail=f"Invalid file type. Allowed: {', '.join(allowed_extensions)}"
+                detail=INVALID_FILE_TYPE_DETAIL
             )
         
         # Generate unique file ID and path
@@ -54,39 +126,30 @@ async def upload_file_with_category(
         file_path = UPLOAD_DIR / unique_filename
         
         # Save file to disk
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
-        file_size = file_path.stat().st_size
+        file_size = await _save_upload(file, file_path)
         
         # Save to database
-        await db.execute(
-            """INSERT INTO uploaded_files 
-            (id, filename, original_filename, file_path, file_size, file_type, category, description)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
-            (
-                file_id,
-                unique_filename,
-                file.filename,
-                str(file_path),
-                file_size,
-                file_ext,
-                category.value,
-                description
+        async with db_pool.writer() as db:
+            await db.execute(
+                INSERT_UPLOADED_FILE_SQL,
+                (
+                    file_id,
+                    unique_filename,
+                    file.filename,
+                    str(file_path),
+                    file_size,
+                    file_ext,
+                    category.value,
+                    description
+                )
             )
-        )
-        await db.commit()
+            await db.commit()
         
         print(f"✅ File uploaded: {file.filename} | Category: {category.value} | Size: {file_size} bytes")
         
-        # ✏️ CHANGE #2: Rebuild RAG system after file upload
+        # ✏️ CHANGE #2: Rebuild RAG system after file upload (after the response is sent)
         print("🔄 Triggering RAG system rebuild...")
-        rebuild_success = await rebuild_rag_system()
-        
-        if rebuild_success:
-            print("✅ RAG system rebuilt successfully")
-        else:
-            print("⚠️ RAG rebuild completed with warnings")
+        background_tasks.add_task(rebuild_rag_system)
         
         return CategoryFileUploadResponse(
             file_id=file_id,
@@ -99,6 +162,8 @@ async def upload_file_with_category(
             description=description
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"❌ Upload error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -113,11 +178,9 @@ async def list_files_by_category(
     """List all uploaded files, optionally filtered by category"""
     try:
         if category:
-            query = "SELECT * FROM uploaded_files WHERE category = ? ORDER BY uploaded_at DESC"
-            cursor = await db.execute(query, (category.value,))
+            cursor = await db.execute(SELECT_UPLOADED_FILES_BY_CATEGORY_SQL, (category.value,))
         else:
-            query = "SELECT * FROM uploaded_files ORDER BY uploaded_at DESC"
-            cursor = await db.execute(query)
+            cursor = await db.execute(SELECT_UPLOADED_FILES_SQL)
         
         rows = await cursor.fetchall()
         
@@ -148,37 +211,30 @@ async def list_files_by_category(
 
 # ✅ NEW: Delete uploaded file
 @router.delete("/delete-category/{file_id}", response_model=SuccessResponse)
-async def delete_category_file(file_id: str, db: aiosqlite.Connection = Depends(get_db)):
+async def delete_category_file(
+    file_id: str,
+    background_tasks: BackgroundTasks
+):
     """Delete uploaded file by ID"""
     try:
-        # Get file info
-        cursor = await db.execute(
-            "SELECT file_path, original_filename FROM uploaded_files WHERE id = ?",
-            (file_id,)
-        )
-        row = await cursor.fetchone()
+        # Delete from database, getting file info back in the same round-trip.
+        # The writer is borrowed only for the DELETE: as a dependency it would
+        # stay held until after the background RAG rebuild finishes.
+        async with db_pool.writer() as db:
+            cursor = await db.execute(DELETE_UPLOADED_FILE_SQL, (file_id,))
+            row = await cursor.fetchone()
+            await db.commit()
         
         if not row:
             raise HTTPException(status_code=404, detail="File not found")
         
         # Delete physical file
-        file_path = Path(row["file_path"])
-        if file_path.exists():
-            file_path.unlink()
+        if await _remove_file(Path(row["file_path"])):
             print(f"🗑️ Deleted file: {row['original_filename']}")
         
-        # Delete from database
-        await db.execute("DELETE FROM uploaded_files WHERE id = ?", (file_id,))
-        await db.commit()
-        
-        # ✏️ CHANGE #3: Rebuild RAG system after file deletion
+        # ✏️ CHANGE #3: Rebuild RAG system after file deletion (after the response is sent)
         print("🔄 Triggering RAG system rebuild after file deletion...")
-        rebuild_success = await rebuild_rag_system()
-        
-        if rebuild_success:
-            print("✅ RAG system rebuilt successfully")
-        else:
-            print("⚠️ RAG rebuild completed with warnings")
+        background_tasks.add_task(rebuild_rag_system)
         
         return SuccessResponse(
             success=True,
@@ -195,46 +251,40 @@ async def delete_category_file(file_id: str, db: aiosqlite.Connection = Depends(
 # ✅ EXISTING: Upload file for chat (keep for backward compatibility)
 @router.post("/upload", response_model=FileUploadResponse)
 async def upload_file(
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
-    chat_id: str = None,
-    db: aiosqlite.Connection = Depends(get_db)
+    chat_id: str = None
 ):
     """Upload Excel/CSV file (legacy - linked to chat)"""
     try:
         # Validate file type
-        allowed_extensions = [".xlsx", ".xls", ".csv"]
-        file_ext = Path(file.filename).suffix.lower()
+        file_ext = os.path.splitext(file.filename)[1].lower()
         
-        if file_ext not in allowed_extensions:
+        if file_ext not in ALLOWED_EXTS:
             raise HTTPException(
                 status_code=400,
-                detail=f"Invalid file type. Allowed: {', '.join(allowed_extensions)}"
+                detail=INVALID_FILE_TYPE_DETAIL
             )
         
         # Generate unique file ID and path
-        file_id = f"file_{datetime.now().timestamp()}"
+        file_id = f"file_{uuid.uuid4().hex}"
         file_path = UPLOAD_DIR / f"{file_id}_{file.filename}"
         
         # Save file
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
-        file_size = file_path.stat().st_size
+        file_size = await _save_upload(file, file_path)
         
         # Save to database
         if chat_id:
-            await db.execute(
-                """INSERT INTO files 
-                (id, chat_id, filename, file_path, file_size, file_type)
-                VALUES (?, ?, ?, ?, ?, ?)""",
-                (file_id, chat_id, file.filename, str(file_path), file_size, file_ext)
-            )
-        
-        await db.commit()
+            async with db_pool.writer() as db:
+                await db.execute(
+                    INSERT_FILE_SQL,
+                    (file_id, chat_id, file.filename, str(file_path), file_size, file_ext)
+                )
+                await db.commit()
         
         # ✏️ CHANGE #4: Rebuild RAG system after legacy upload too
         print("🔄 Triggering RAG system rebuild...")
-        await rebuild_rag_system()
+        background_tasks.add_task(rebuild_rag_system)
         
         return FileUploadResponse(
             file_id=file_id,
@@ -244,6 +294,8 @@ async def upload_file(
             uploaded_at=datetime.now().isoformat()
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -251,10 +303,7 @@ async def upload_file(
 @router.get("/list/{chat_id}")
 async def list_files(chat_id: str, db: aiosqlite.Connection = Depends(get_db)):
     """List all files for a chat"""
-    cursor = await db.execute(
-        "SELECT * FROM files WHERE chat_id = ? ORDER BY uploaded_at DESC",
-        (chat_id,)
-    )
+    cursor = await db.execute(SELECT_CHAT_FILES_SQL, (chat_id,))
     rows = await cursor.fetchall()
     
     return [
@@ -270,27 +319,27 @@ async def list_files(chat_id: str, db: aiosqlite.Connection = Depends(get_db)):
 
 
 @router.delete("/{file_id}", response_model=SuccessResponse)
-async def delete_file(file_id: str, db: aiosqlite.Connection = Depends(get_db)):
+async def delete_file(
+    file_id: str,
+    background_tasks: BackgroundTasks
+):
     """Delete uploaded file"""
-    # Get file info
-    cursor = await db.execute("SELECT file_path FROM files WHERE id = ?", (file_id,))
-    row = await cursor.fetchone()
+    # Delete from database, getting file info back in the same round-trip
+    # (writer scoped to the DELETE, not the background rebuild)
+    async with db_pool.writer() as db:
+        cursor = await db.execute(DELETE_FILE_SQL, (file_id,))
+        row = await cursor.fetchone()
+        await db.commit()
     
     if not row:
         raise HTTPException(status_code=404, detail="File not found")
     
     # Delete physical file
-    file_path = Path(row["file_path"])
-    if file_path.exists():
-        file_path.unlink()
-    
-    # Delete from database
-    await db.execute("DELETE FROM files WHERE id = ?", (file_id,))
-    await db.commit()
+    await _remove_file(Path(row["file_path"]))
     
     # ✏️ CHANGE #5: Rebuild RAG after legacy file deletion
     print("🔄 Triggering RAG system rebuild after file deletion...")
-    await rebuild_rag_system()
+    background_tasks.add_task(rebuild_rag_system)
     
     return SuccessResponse(
         success=True,
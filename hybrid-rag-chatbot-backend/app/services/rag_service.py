@@ -6,27 +6,72 @@ Integrates friend's RAG system with FastAPI backend
 
 import os
 import asyncio
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, AsyncIterator
 import pandas as pd
 
 # Import friend's RAG components (at ROOT level)
-from models.data.loader import load_excel_files
+from models.data.loader import get_process_pool, shutdown_process_pool, list_sheets, parse_sheet, merge_frames
 from models.schema.schema_builder import build_schema
 from models.core.planner import Planner
 from models.core.analytics_engine import AnalyticsEngine
-from models.llm.llm_client import generate
+from models.llm.llm_client import agenerate_stream
 from models.rag.schema_docs import build_schema_docs
 from models.rag.dataset_summary import build_dataset_summary
-from models.rag.embeddings import embed
+from models.rag.embeddings import aembed
 from models.rag.vectorstore import VectorStore
 from models.rag.retriever import Retriever
+from models.rag import cache as rag_cache
+
+
+# Copy-on-write: derived frames never duplicate the base data until written
+# (always on from pandas 3.0, where setting the option is deprecated)
+if int(pd.__version__.split(".")[0]) < 3:
+    pd.set_option("mode.copy_on_write", True)
 
 
 # ==================== Configuration ====================
 UPLOAD_DIR = Path(__file__).parent.parent.parent / "data" / "uploads"
 PLANNER_PROMPT_PATH = Path(__file__).parent.parent.parent / "models" / "prompts" / "planner_prompt.txt"
 
+# Static prompt templates (built once, filled per request with str.format)
+FOLLOWUP_PROMPT_TEMPLATE = """
+            You are a business analyst helping explain data analytics.
+            
+            User asked a follow-up question: {question}
+            
+            Based on the conversation history, provide a clear explanation.
+            """
+
+EXPLAIN_PROMPT_TEMPLATE = """
+You are a business analyst for ARG Supply Tech, specializing in supply chain analytics.
+
+Context from the dataset:
+{context}
+
+User question:
+{question}
+
+Provide a clear, helpful explanation based only on the context provided.
+"""
+
+ANALYTICS_PROMPT_TEMPLATE = """
+You are a financial analyst for ARG Supply Tech.
+
+User question:
+{question}
+
+Computed analytical result:
+{result}
+
+Explain this result in clear, professional business language.
+- Use the actual numbers from the result
+- Keep it concise (2-3 sentences)
+- Don't change or round the numbers
+- Focus on insights and meaning
+"""
+
 
 # ==================== RAG State Manager ====================
 class RAGState:
@@ -48,12 +93,39 @@ class RAGState:
 # Global RAG state instance
 _rag_state = RAGState()
 
+# Serializes background rebuilds triggered by back-to-back uploads/deletes
+_rebuild_lock = asyncio.Lock()
+
+# In-flight retrievals, so concurrent identical questions share one embedding RPC
+_inflight_context: Dict[tuple, asyncio.Task] = {}
+
 
 # ==================== Async Wrappers for Sync Functions ====================
 
 async def _load_files_async(file_paths: List[str]) -> pd.DataFrame:
-    """Async wrapper for load_excel_files"""
-    return await asyncio.to_thread(load_excel_files, file_paths)
+    """Parse every (file, sheet) pair concurrently in the loader's process pool"""
+    try:
+        frames = await _parse_sheets_async(get_process_pool(), file_paths)
+    except BrokenProcessPool:
+        # A worker died (e.g. out of memory): replace the pool and retry once
+        print("⚠️ Excel worker pool broke, restarting it...")
+        shutdown_process_pool()
+        frames = await _parse_sheets_async(get_process_pool(), file_paths)
+    
+    return await asyncio.to_thread(merge_frames, frames)
+
+
+async def _parse_sheets_async(pool, file_paths: List[str]) -> List[pd.DataFrame]:
+    loop = asyncio.get_running_loop()
+    
+    sheet_lists = await asyncio.gather(*(
+        loop.run_in_executor(pool, list_sheets, path) for path in file_paths
+    ))
+    return await asyncio.gather(*(
+        loop.run_in_executor(pool, parse_sheet, path, sheet)
+        for path, sheets in zip(file_paths, sheet_lists)
+        for sheet in sheets
+    ))
 
 
 async def _build_schema_async(df: pd.DataFrame) -> Dict:
@@ -62,13 +134,8 @@ async def _build_schema_async(df: pd.DataFrame) -> Dict:
 
 
 async def _embed_async(texts: List[str]) -> List:
-    """Async wrapper for embed"""
-    return await asyncio.to_thread(embed, texts)
-
-
-async def _generate_async(prompt: str) -> str:
-    """Async wrapper for generate (LLM call)"""
-    return await asyncio.to_thread(generate, prompt)
+    """Embed texts through the shared micro-batching queue"""
+    return list(await asyncio.gather(*(aembed(text) for text in texts)))
 
 
 async def _planner_plan_async(planner: Planner, question: str) -> Dict:
@@ -82,8 +149,17 @@ async def _engine_run_async(engine: AnalyticsEngine, plan: Dict):
 
 
 async def _retriever_get_context_async(retriever: Retriever, question: str) -> str:
-    """Async wrapper for retriever.get_context"""
-    return await asyncio.to_thread(retriever.get_context, question)
+    """Run retriever.get_context, coalescing identical concurrent calls"""
+    key = (retriever, question.strip().lower())
+    task = _inflight_context.get(key)
+    
+    if task is None:
+        task = asyncio.create_task(retriever.get_context(question))
+        _inflight_context[key] = task
+        task.add_done_callback(lambda _: _inflight_context.pop(key, None))
+    
+    # Shielded so one cancelled caller doesn't cancel the shared lookup
+    return await asyncio.shield(task)
 
 
 # ==================== Initialization ====================
@@ -115,40 +191,59 @@ async def initialize_rag_system(force_rebuild: bool = False) -> bool:
         
         print(f"🔄 Initializing RAG system with {len(excel_files)} files...")
         
-        # Step 1: Load Excel files
-        file_paths = [str(f) for f in excel_files]
-        _rag_state.df = await _load_files_async(file_paths)
-        print(f"📊 Loaded {len(_rag_state.df)} rows, {len(_rag_state.df.columns)} columns")
+        # Reuse the on-disk cache when the uploaded files haven't changed
+        key = await asyncio.to_thread(rag_cache.cache_key, excel_files)
+        cached = await asyncio.to_thread(rag_cache.load, key)
+        vectorstore = None
         
-        # Step 2: Build schema
-        _rag_state.schema = await _build_schema_async(_rag_state.df)
-        print(f"🧠 Schema built: {len(_rag_state.schema)} columns")
+        if cached is not None:
+            _rag_state.df, _rag_state.schema, vectorstore = cached
+            print(f"💾 Loaded {len(_rag_state.df)} rows, {len(_rag_state.schema)} columns from cache")
+        else:
+            # Step 1: Load Excel files
+            file_paths = [str(f) for f in excel_files]
+            _rag_state.df = await _load_files_async(file_paths)
+            print(f"📊 Loaded {len(_rag_state.df)} rows, {len(_rag_state.df.columns)} columns")
+            
+            # Step 2: Build schema
+            _rag_state.schema = await _build_schema_async(_rag_state.df)
+            print(f"🧠 Schema built: {len(_rag_state.schema)} columns")
         
         # Step 3: Load planner prompt
         with open(PLANNER_PROMPT_PATH, "r", encoding="utf-8") as f:
             planner_prompt = f.read()
         
         # Step 4: Initialize Planner + Analytics Engine
-        _rag_state.planner = Planner(_rag_state.schema, planner_prompt)
+        # (Planner creates the Vertex prompt cache, so build it off the event loop)
+        old_planner = _rag_state.planner
+        _rag_state.planner = await asyncio.to_thread(Planner, _rag_state.schema, planner_prompt)
+        if old_planner is not None:
+            # Free the replaced planner's Vertex context cache
+            await asyncio.to_thread(old_planner.close)
         _rag_state.engine = AnalyticsEngine(_rag_state.df, _rag_state.schema)
         print("✅ Planner & Analytics Engine initialized")
         
         # Step 5: Build RAG Memory (with quota protection)
-        try:
-            schema_docs = build_schema_docs(_rag_state.schema)
-            dataset_doc = build_dataset_summary(_rag_state.df)
-            rag_texts = schema_docs + [dataset_doc]
-            
-            print("🔄 Creating embeddings...")
-            rag_embeddings = await _embed_async(rag_texts)
+        if vectorstore is None:
+            try:
+                schema_docs = build_schema_docs(_rag_state.schema)
+                dataset_docs = await asyncio.to_thread(build_dataset_summary, _rag_state.df)
+                rag_texts = schema_docs + dataset_docs
+                
+                print("🔄 Creating embeddings...")
+                rag_embeddings = await _embed_async(rag_texts)
+                
+                vectorstore = VectorStore(rag_embeddings, rag_texts)
+                
+            except Exception as e:
+                print(f"⚠️ RAG retriever disabled (embedding error): {str(e)}")
             
-            vectorstore = VectorStore(rag_embeddings, rag_texts)
-            _rag_state.retriever = Retriever(vectorstore)
+            # Persist whatever was built (index only if embedding succeeded)
+            await asyncio.to_thread(rag_cache.save, key, _rag_state.df, _rag_state.schema, vectorstore)
+        
+        _rag_state.retriever = Retriever(vectorstore) if vectorstore is not None else None
+        if _rag_state.retriever is not None:
             print("✅ RAG retriever ready")
-            
-        except Exception as e:
-            print(f"⚠️ RAG retriever disabled (embedding error): {str(e)}")
-            _rag_state.retriever = None
         
         _rag_state.file_count = len(excel_files)
         _rag_state.initialized = True
@@ -163,74 +258,89 @@ async def initialize_rag_system(force_rebuild: bool = False) -> bool:
 
 # ==================== Follow-up Detection ====================
 
+_FOLLOWUP = frozenset({
+    "why", "why?", "explain", "explain?", "how", "how?",
+    "compare", "compare?", "what about this", "what about it",
+    "more details", "details", "tell me more"
+})
+
+
 def is_followup(question: str) -> bool:
     """Check if question is a follow-up"""
-    q = question.lower().strip()
-    return q in [
-        "why", "why?", "explain", "explain?", "how", "how?",
-        "compare", "compare?", "what about this", "what about it",
-        "more details", "details", "tell me more"
-    ]
+    return question.lower().strip() in _FOLLOWUP
 
 
 # ==================== Main RAG Query Function ====================
 
-async def get_rag_response(user_message: str, chat_history: list = None) -> str:
+RAG_ERROR_MESSAGE = "Sorry, I encountered an error processing your question. Please try again or rephrase your question."
+
+
+async def stream_rag_response(user_message: str, chat_history: list = None) -> AsyncIterator[str]:
     """
-    Get response from RAG system (replaces get_groq_response)
+    Stream response from RAG system, token by token
     
     Args:
         user_message: User's question
         chat_history: Previous messages (optional, for context)
         
-    Returns:
-        Bot's response text
+    Yields:
+        Chunks of the bot's response text
+        
+    Raises:
+        Any pipeline error, so callers can tell a failed answer from a
+        complete one (get_rag_response turns it into RAG_ERROR_MESSAGE)
     """
     try:
         # Initialize if needed
         if not _rag_state.is_initialized():
-            success = await initialize_rag_system()
+            # Serialized with background rebuilds (e.g. right after the first
+            # upload), which may have finished while we waited for the lock
+            async with _rebuild_lock:
+                success = _rag_state.is_initialized() or await initialize_rag_system()
             if not success:
-                return "Sorry, I don't have any data files loaded yet. Please upload Excel/CSV files first."
+                yield "Sorry, I don't have any data files loaded yet. Please upload Excel/CSV files first."
+                return
         
         # Handle follow-up questions (uses last analytical result)
         # Note: This requires session state management - simplified for now
         if is_followup(user_message):
-            explain_prompt = f"""
-            You are a business analyst helping explain data analytics.
-            
-            User asked a follow-up question: {user_message}
-            
-            Based on the conversation history, provide a clear explanation.
-            """
-            answer = await _generate_async(explain_prompt)
-            return answer
+            explain_prompt = FOLLOWUP_PROMPT_TEMPLATE.format(question=user_message)
+            async for token in agenerate_stream(explain_prompt):
+                yield token
+            return
         
-        # Step 1: Plan the query
-        plan = await _planner_plan_async(_rag_state.planner, user_message)
+        # Step 1: Plan the query, retrieving context in parallel
+        # (only needs the question; dropped if the plan isn't EXPLAIN)
+        plan_task = asyncio.create_task(_planner_plan_async(_rag_state.planner, user_message))
+        ctx_task = None
+        if _rag_state.retriever is not None:
+            ctx_task = asyncio.create_task(
+                _retriever_get_context_async(_rag_state.retriever, user_message)
+            )
+        
+        try:
+            plan = await plan_task
+        except Exception:
+            if ctx_task is not None:
+                ctx_task.cancel()
+            raise
         
         print(f"📋 Plan: {plan}")
         
+        if plan["type"] != "explain" and ctx_task is not None:
+            ctx_task.cancel()
+        
         # Step 2: Handle EXPLAIN queries (RAG)
         if plan["type"] == "explain":
-            if _rag_state.retriever is None:
-                return "I can help with data analysis, but the knowledge retrieval system is currently unavailable. Please ask specific analytical questions instead."
+            if ctx_task is None:
+                yield "I can help with data analysis, but the knowledge retrieval system is currently unavailable. Please ask specific analytical questions instead."
+                return
             
-            context = await _retriever_get_context_async(_rag_state.retriever, user_message)
+            context = await ctx_task
             
-            prompt = f"""
-You are a business analyst for ARG Supply Tech, specializing in supply chain analytics.
-
-Context from the dataset:
-{context}
-
-User question:
-{user_message}
-
-Provide a clear, helpful explanation based only on the context provided.
-"""
-            answer = await _generate_async(prompt)
-            return answer
+            prompt = EXPLAIN_PROMPT_TEMPLATE.format(context=context, question=user_message)
+            async for token in agenerate_stream(prompt):
+                yield token
         
         # Step 3: Handle ANALYTICS queries
         elif plan["type"] == "analytics":
@@ -238,42 +348,61 @@ Provide a clear, helpful explanation based only on the context provided.
             result = await _engine_run_async(_rag_state.engine, plan)
             
             if result is None:
-                return "I couldn't find any data matching your question. Could you try rephrasing?"
+                yield "I couldn't find any data matching your question. Could you try rephrasing?"
+                return
             
             # Generate natural language explanation
-            explain_prompt = f"""
-You are a financial analyst for ARG Supply Tech.
-
-User question:
-{user_message}
-
-Computed analytical result:
-{result}
-
-Explain this result in clear, professional business language.
-- Use the actual numbers from the result
-- Keep it concise (2-3 sentences)
-- Don't change or round the numbers
-- Focus on insights and meaning
-"""
-            final_answer = await _generate_async(explain_prompt)
-            return final_answer
+            explain_prompt = ANALYTICS_PROMPT_TEMPLATE.format(question=user_message, result=result)
+            async for token in agenerate_stream(explain_prompt):
+                yield token
         
         else:
             # Unknown plan type
-            return "I'm not sure how to process that question. Could you try asking differently?"
+            yield "I'm not sure how to process that question. Could you try asking differently?"
     
     except Exception as e:
         print(f"❌ RAG Error: {str(e)}")
-        return f"Sorry, I encountered an error processing your question. Please try again or rephrase your question."
+        raise
+
+
+async def get_rag_response(user_message: str, chat_history: list = None) -> str:
+    """
+    Get response from RAG system (replaces get_groq_response)
+    
+    Args:
+        user_message: User's question
+        chat_history: Previous messages (optional, for context)
+        
+    Returns:
+        Bot's response text
+    """
+    try:
+        tokens = [token async for token in stream_rag_response(user_message, chat_history)]
+    except Exception:
+        return RAG_ERROR_MESSAGE
+    return "".join(tokens).strip()
 
 
 # ==================== Utility Functions ====================
 
 async def rebuild_rag_system() -> bool:
     """Force rebuild RAG system (call after file upload)"""
-    print("🔄 Rebuilding RAG system...")
-    return await initialize_rag_system(force_rebuild=True)
+    async with _rebuild_lock:
+        print("🔄 Rebuilding RAG system...")
+        rebuild_success = await initialize_rag_system(force_rebuild=True)
+    
+    if rebuild_success:
+        print("✅ RAG system rebuilt successfully")
+    else:
+        print("⚠️ RAG rebuild completed with warnings")
+    
+    return rebuild_success
+
+
+async def shutdown_rag_system():
+    """Release remote resources held by the RAG system (call on shutdown)"""
+    if _rag_state.planner is not None:
+        await asyncio.to_thread(_rag_state.planner.close)
 
 
 def get_rag_status() -> Dict:
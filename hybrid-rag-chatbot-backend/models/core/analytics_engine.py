@@ -1,23 +1,227 @@
+import numpy as np
 import pandas as pd
 
+from models.core.kernels import GROUP_OPS, group_reduce
+
+try:
+    import polars as pl
+except ImportError:
+    # No Polars mirror is built; every plan runs on pandas
+    pl = None
+
+# Grouped frames smaller than this use plain pandas reductions
+NUMBA_MIN_ROWS = 10_000
+
+# Frames smaller than this aren't worth mirroring into Polars
+POLARS_MIN_ROWS = 10_000
+
+AGG_OPS = ("sum", "avg", "max", "min", "count_unique")
+
+
+def _na_to_nan(value):
+    # Arrow-backed columns reduce to pd.NA (not NaN) when nothing is left
+    return np.nan if value is pd.NA else value
+
+
+def _lower_name(col):
+    return f"__lower__{col}"
+
+
+def _polars_agg(col, op):
+    expr = pl.col(col)
+    if op == "sum":
+        return expr.sum()
+    if op == "avg":
+        return expr.mean()
+    if op == "max":
+        return expr.max()
+    if op == "min":
+        return expr.min()
+    # pandas nunique() doesn't count missing values
+    return expr.drop_nulls().n_unique()
+
 
 class AnalyticsEngine:
-    def __init__(self, df, schema):
+    def __init__(self, df, schema, fast_paths=True):
         self.df = df
         self.schema = schema
+        # False = plain pandas only (no numba kernel, no Polars mirror)
+        self.fast_paths = fast_paths
+
+        # Lowercased categorical codes for each string column, built once so
+        # filters compare integers instead of lowercasing the column per query
+        self._lower_cache = {}
+        for col in schema.values():
+            series = df[col]
+            if pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series):
+                self._lower_cache[col] = series.astype(str).str.lower().astype("category")
+
+        # Group indexes over the unfiltered frame, reused across queries
+        self._groupers = {}
+        self._group_codes = {}
+
+        # Lazy Polars mirror of the frame for single-pass filtered aggregates,
+        # with the lowercased string columns precomputed like _lower_cache
+        self._lf = None
+        if fast_paths and pl is not None and len(df) >= POLARS_MIN_ROWS:
+            try:
+                frame = pl.from_pandas(df)
+                self._lf = frame.with_columns(
+                    pl.col(col).cast(pl.String).str.to_lowercase()
+                    .cast(pl.Categorical).alias(_lower_name(col))
+                    for col in self._lower_cache
+                ).lazy()
+            except Exception as e:
+                print(f"⚠️ Polars unavailable for this dataset: {str(e)}")
 
     def _col(self, semantic):
         if semantic not in self.schema:
             raise ValueError(f"Unknown column: {semantic}")
         return self.schema[semantic]
 
+    def _filter_mask(self, df, col, val):
+        lowered = self._lower_cache.get(col)
+
+        # Non-string column: compare as strings
+        if lowered is None:
+            return df[col].astype(str).str.lower() == val
+
+        categories = lowered.cat.categories
+        if val in categories:
+            mask = lowered.cat.codes == categories.get_loc(val)
+        else:
+            mask = pd.Series(False, index=lowered.index)
+
+        # Codes are aligned to the full frame; narrow to earlier filter results
+        if not mask.index.equals(df.index):
+            mask = mask.reindex(df.index)
+        return mask
+
+    def _groupby(self, df, col):
+        # Only the unfiltered frame is cacheable; filtered frames differ per query
+        if df is not self.df:
+            return df.groupby(col, observed=True)
+
+        grouped = self._groupers.get(col)
+        if grouped is None:
+            grouped = self._groupers[col] = df.groupby(col, observed=True)
+        return grouped
+
+    def _factorize(self, frame, group_col):
+        if frame is not self.df:
+            return pd.factorize(frame[group_col], sort=True)
+
+        codes = self._group_codes.get(group_col)
+        if codes is None:
+            codes = self._group_codes[group_col] = pd.factorize(frame[group_col], sort=True)
+        return codes
+
+    def _fast_group_agg(self, grouped, group_col, col, op):
+        """Numba grouped reduction for large numeric frames (None = use pandas)"""
+        if not self.fast_paths or group_reduce is None or op not in GROUP_OPS:
+            return None
+
+        frame = grouped.obj
+        series = frame[col]
+        if (
+            len(frame) < NUMBA_MIN_ROWS
+            or not pd.api.types.is_numeric_dtype(series)
+            or pd.api.types.is_bool_dtype(series)
+        ):
+            return None
+
+        codes, uniques = self._factorize(frame, group_col)
+        values = series.to_numpy(dtype=np.float64, na_value=np.nan)
+        out = group_reduce(values, codes, len(uniques), GROUP_OPS[op])
+
+        result = pd.Series(out, index=pd.Index(uniques, name=group_col), name=col)
+        if op != "avg" and pd.api.types.is_integer_dtype(series) and not series.hasnans:
+            result = result.astype(series.dtype)
+        return result
+
+    def _run_polars(self, steps):
+        """
+        Runs a leading filter+ -> [groupby] -> aggregate prefix of the plan
+        as one optimized Polars query, skipping the intermediate frames.
+        Returns (result, steps consumed), or None to use pandas.
+        Unfiltered plans stay on pandas, where group indexes are cached.
+        """
+        if self._lf is None or not steps or steps[0]["op"] != "filter":
+            return None
+
+        lf = self._lf
+        group_col = None
+
+        for i, step in enumerate(steps):
+            op = step["op"]
+
+            if op == "filter" and group_col is None:
+                col = self._col(step["column"])
+                # Only string columns: other dtypes stringify differently
+                if col not in self._lower_cache:
+                    return None
+                val = str(step["value"]).lower()
+                lf = lf.filter(pl.col(_lower_name(col)) == val)
+
+            elif op == "groupby" and group_col is None:
+                group_col = self._col(step["column"])
+
+            elif op in AGG_OPS:
+                col = self._col(step["metric"])
+                expr = _polars_agg(col, op).alias("__value")
+                break
+
+            else:
+                return None
+        else:
+            return None
+
+        try:
+            if group_col is None:
+                value = lf.select(expr).collect().item()
+                if value is None:
+                    return np.nan, i + 1
+                return (round(value, 2) if op == "avg" else value), i + 1
+
+            # pandas drops missing keys and sorts the group keys
+            out = (
+                lf.filter(pl.col(group_col).is_not_null())
+                .group_by(group_col)
+                .agg(expr)
+                .sort(group_col)
+                .collect()
+            )
+        except Exception:
+            return None
+
+        result = pd.Series(
+            out["__value"].to_list(),
+            index=pd.Index(out[group_col].to_list(), name=group_col),
+            name=col
+        )
+        if op == "avg":
+            result = result.round(2)
+        return result, i + 1
+
     def run(self, plan):
         if plan["type"] != "analytics":
             return None
 
-        df = self.df.copy()
+        # No defensive copy: every step below returns a new object and
+        # never writes into self.df (copy-on-write is enabled in rag_service)
+        df = self.df
+        group_col = None
+        steps = plan["steps"]
+
+        fast = self._run_polars(steps)
+        if fast is not None:
+            df, done = fast
+            # Ungrouped aggregates end the plan, like the pandas path below
+            if not isinstance(df, pd.Series):
+                return df
+            steps = steps[done:]
 
-        for step in plan["steps"]:
+        for step in steps:
             op = step["op"]
 
             # ------------------------
@@ -26,24 +230,28 @@ class AnalyticsEngine:
             if op == "filter":
                 col = self._col(step["column"])
                 val = str(step["value"]).lower()
-                df = df[df[col].astype(str).str.lower() == val]
+                df = df[self._filter_mask(df, col, val)]
 
             # ------------------------
             # GROUP BY
             # ------------------------
             elif op == "groupby":
                 col = self._col(step["column"])
-                df = df.groupby(col)
+                df = self._groupby(df, col)
+                group_col = col
 
             # ------------------------
             # AGGREGATIONS
             # ------------------------
-            elif op in ["sum", "avg", "max", "min", "count_unique"]:
+            elif op in AGG_OPS:
                 col = self._col(step["metric"])
 
                 # If grouped, return Series
                 if isinstance(df, pd.core.groupby.generic.DataFrameGroupBy):
-                    if op == "sum":
+                    fast = self._fast_group_agg(df, group_col, col, op)
+                    if fast is not None:
+                        df = fast.round(2) if op == "avg" else fast
+                    elif op == "sum":
                         df = df[col].sum()
                     elif op == "avg":
                         df = df[col].mean().round(2)
@@ -59,11 +267,12 @@ class AnalyticsEngine:
                     if op == "sum":
                         return df[col].sum()
                     elif op == "avg":
-                        return round(df[col].mean(), 2)
+                        mean = _na_to_nan(df[col].mean())
+                        return mean if pd.isna(mean) else round(mean, 2)
                     elif op == "max":
-                        return df[col].max()
+                        return _na_to_nan(df[col].max())
                     elif op == "min":
-                        return df[col].min()
+                        return _na_to_nan(df[col].min())
                     elif op == "count_unique":
                         return df[col].nunique()
 
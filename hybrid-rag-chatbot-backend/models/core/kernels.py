@@ -0,0 +1,52 @@
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:
+    # group_reduce is then None and AnalyticsEngine uses pandas reductions
+    njit = None
+
+
+# Reduction codes understood by group_reduce
+GROUP_OPS = {"sum": 0, "avg": 1, "max": 2, "min": 3}
+
+
+if njit is not None:
+
+    @njit(cache=True)
+    def group_reduce(values, codes, n_groups, op):
+        """
+        Single-pass grouped sum/mean/max/min over int group codes.
+        NaN values and negative codes (missing keys) are skipped,
+        matching pandas groupby semantics.
+        """
+        out = np.full(n_groups, np.nan)
+        counts = np.zeros(n_groups, dtype=np.int64)
+
+        for i in range(values.shape[0]):
+            g = codes[i]
+            v = values[i]
+            if g < 0 or np.isnan(v):
+                continue
+
+            if counts[g] == 0:
+                out[g] = v
+            elif op == 0 or op == 1:
+                out[g] += v
+            elif op == 2:
+                if v > out[g]:
+                    out[g] = v
+            elif v < out[g]:
+                out[g] = v
+            counts[g] += 1
+
+        for g in range(n_groups):
+            if op == 0 and counts[g] == 0:
+                out[g] = 0.0
+            elif op == 1 and counts[g] > 0:
+                out[g] = out[g] / counts[g]
+
+        return out
+
+else:
+    group_reduce = None
@@ -1,21 +1,86 @@
 import json
+import re
+import threading
+import time
 from models.llm import llm_client
 
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    json_loads = json.loads
+
+# Markdown code fences the model sometimes wraps its JSON in
+_FENCE_RE = re.compile(r"```(?:json)?")
+
 class Planner:
     def __init__(self, schema, prompt):
         self.schema = schema
         self.prompt = prompt
 
-    def plan(self, question):
+        # Static prefix (instructions + schema) first, question last,
+        # so the prefix can be served from the Vertex context cache
         schema_text = "\n".join([f"{k} → {v}" for k,v in self.schema.items()])
-        full_prompt = self.prompt.replace("{schema}", schema_text)
+        self._prompt_prefix = self.prompt.replace("{schema}", schema_text)
+
+        # (cached_content, model bound to it), swapped as one tuple so
+        # concurrent plan() threads never see a mismatched pair
+        self._cache = None
+        self._cache_expires_at = 0.0
+        self._cache_lock = threading.Lock()
+        self._refresh_cache()
+
+    def _refresh_cache(self):
+        old = self._cache
+
+        cached_content = llm_client.create_cached_content(self._prompt_prefix)
+        if cached_content is not None:
+            self._cache = (cached_content, llm_client.model_for_cache(cached_content))
+        else:
+            self._cache = None
+        # Refresh a minute before Vertex expires the cache
+        ttl = llm_client.CACHE_TTL.total_seconds() - 60
+        self._cache_expires_at = time.monotonic() + ttl
+
+        # Stop paying storage for the replaced cache
+        if old is not None:
+            llm_client.delete_cached_content(old[0])
 
-        response = llm_client.generate(full_prompt + "\nQuestion: " + question)
+    def _drop_cache(self, cache):
+        with self._cache_lock:
+            if self._cache is not cache:
+                return
+            self._cache = None
+        llm_client.delete_cached_content(cache[0])
+
+    def close(self):
+        """Deletes the Vertex context cache (call when replacing the planner)"""
+        cache = self._cache
+        if cache is not None:
+            self._drop_cache(cache)
+
+    def _generate(self, question):
+        if self._cache is not None and time.monotonic() >= self._cache_expires_at:
+            with self._cache_lock:
+                # Another thread may have refreshed while we waited
+                if self._cache is not None and time.monotonic() >= self._cache_expires_at:
+                    self._refresh_cache()
+
+        cache = self._cache
+        if cache is not None:
+            try:
+                return llm_client.generate("Question: " + question, cached_model=cache[1])
+            except Exception as e:
+                print(f"⚠️ Cached planner call failed, using full prompt: {str(e)}")
+                self._drop_cache(cache)
+
+        return llm_client.generate(self._prompt_prefix + "\nQuestion: " + question)
+
+    def plan(self, question):
+        response = self._generate(question)
 
-        raw = response.strip()
-        raw = raw.replace("```json","").replace("```","").strip()
+        raw = _FENCE_RE.sub("", response).strip()
 
         try:
-            return json.loads(raw)
+            return json_loads(raw)
         except:
             return {"type":"explain"}
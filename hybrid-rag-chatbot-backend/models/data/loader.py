@@ -1,18 +1,53 @@
-#reads the excel file 
+#reads the excel file
 # data/loader.py
+import importlib.util
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
 import pandas as pd
+import pyarrow as pa
+
+
+# Rust-based reader is much faster than openpyxl when installed
+EXCEL_ENGINE = "calamine" if importlib.util.find_spec("python_calamine") else None
+
+# Sheet parsing is CPU-bound, so it runs in worker processes (created lazily).
+# The server is multi-threaded (aiosqlite, executor, gRPC) by the time the
+# pool starts, so workers are never forked from it; forkserver is POSIX-only.
+START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+_process_pool = None
+
+
+def get_process_pool():
+    global _process_pool
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(
+            max_workers=os.cpu_count(),
+            mp_context=multiprocessing.get_context(START_METHOD)
+        )
+    return _process_pool
 
 
-def load_excel_files(file_paths):
-    all_frames = []
+def shutdown_process_pool():
+    global _process_pool
+    if _process_pool is not None:
+        _process_pool.shutdown(cancel_futures=True)
+        _process_pool = None
 
-    for path in file_paths:
-        excel = pd.ExcelFile(path)
 
-        for sheet in excel.sheet_names:
-            df = excel.parse(sheet)
-            if not df.empty:
-                all_frames.append(df)
+def list_sheets(path):
+    with pd.ExcelFile(path, engine=EXCEL_ENGINE) as excel:
+        return excel.sheet_names
+
+
+def parse_sheet(path, sheet):
+    return pd.read_excel(path, sheet_name=sheet, engine=EXCEL_ENGINE)
+
+
+def merge_frames(frames):
+    all_frames = [df for df in frames if not df.empty]
 
     if not all_frames:
         raise ValueError("No data found in uploaded Excel files.")
@@ -22,4 +57,15 @@ def load_excel_files(file_paths):
     # Clean column names
     merged.columns = [c.strip() for c in merged.columns]
 
+    # Arrow-backed dtypes: compact string buffers and nullable ints
+    # (no float upcast when a column has missing values). Float columns
+    # holding only whole numbers, e.g. [1.0, nan, 3.0], become int64[pyarrow].
+    merged = merged.convert_dtypes(dtype_backend="pyarrow")
+
+    # Columns mixing types (e.g. codes like "A1" next to 123) stay object,
+    # which neither parquet (RAG cache) nor Polars can store: use strings
+    for col in merged.columns[merged.dtypes == object]:
+        merged[col] = merged[col].astype("string").astype(pd.ArrowDtype(pa.string()))
+
     return merged
+
@@ -1,7 +1,10 @@
 import os
+import datetime
 from dotenv import load_dotenv
 import vertexai
 from vertexai.generative_models import GenerativeModel
+from vertexai.preview import caching
+from vertexai.preview.generative_models import GenerativeModel as CachedGenerativeModel
 
 # Load .env
 load_dotenv()
@@ -19,21 +22,82 @@ vertexai.init(
 )
 
 # Load Gemini 2.5 Flash
-model = GenerativeModel("gemini-2.5-flash")
+MODEL_NAME = "gemini-2.5-flash"
+model = GenerativeModel(MODEL_NAME)
 
+# Lifetime of context caches for static prompt prefixes
+CACHE_TTL = datetime.timedelta(hours=1)
 
-def generate(prompt):
+GENERATION_CONFIG = {
+    "temperature": 0.2,
+    "max_output_tokens": 5000
+}
+
+
+def create_cached_content(system_instruction):
+    """
+    Caches a static prompt prefix on Vertex AI so later calls
+    only send (and pay for) the dynamic part.
+    Returns None if caching is unavailable, e.g. when the prefix is
+    below the minimum cacheable token count.
+    """
+
+    try:
+        return caching.CachedContent.create(
+            model_name=MODEL_NAME,
+            system_instruction=system_instruction,
+            ttl=CACHE_TTL
+        )
+    except Exception as e:
+        print(f"⚠️ Context cache unavailable: {str(e)}")
+        return None
+
+
+def delete_cached_content(cached_content):
+    """
+    Deletes a context cache so it stops billing storage before its TTL.
+    Best-effort: the cache may already have expired.
+    """
+
+    try:
+        cached_content.delete()
+    except Exception as e:
+        print(f"⚠️ Context cache delete failed: {str(e)}")
+
+
+def model_for_cache(cached_content):
+    """Model bound to a context cache, for use with generate()"""
+    return CachedGenerativeModel.from_cached_content(cached_content=cached_content)
+
+
+def generate(prompt, cached_model=None):
     """
     Sends a prompt to Gemini 2.5 Flash on Vertex AI.
+    With cached_model, the prompt is appended to its cached prefix.
     Returns clean text output.
     """
 
-    response = model.generate_content(
+    response = (cached_model or model).generate_content(
         prompt,
-        generation_config={
-            "temperature": 0.2,
-            "max_output_tokens": 5000
-        }
+        generation_config=GENERATION_CONFIG
     )
 
     return response.text.strip()
+
+
+async def agenerate_stream(prompt):
+    """
+    Streams Gemini's answer as text chunks using the native async
+    Vertex AI client, so the event loop is never blocked (and no worker
+    thread is used) while tokens arrive.
+    """
+
+    responses = await model.generate_content_async(
+        prompt,
+        generation_config=GENERATION_CONFIG,
+        stream=True
+    )
+
+    async for chunk in responses:
+        if chunk.candidates and chunk.candidates[0].content.parts:
+            yield chunk.text
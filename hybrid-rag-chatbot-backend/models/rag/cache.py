@@ -0,0 +1,81 @@
+# rag/cache.py
+# Persists the merged DataFrame, schema and vector index between restarts,
+# keyed by the uploaded files' paths, sizes and mtimes
+import hashlib
+import json
+from pathlib import Path
+
+import pandas as pd
+
+from models.rag.vectorstore import VectorStore
+
+
+CACHE_DIR = Path(__file__).parent.parent.parent / "data" / "rag_cache"
+
+# Part of every key: bump whenever what gets cached changes (RAG docs,
+# index type, DataFrame dtypes) so old entries stop matching after a deploy
+CACHE_VERSION = 1
+
+
+def cache_key(files):
+    digest = hashlib.sha256()
+    digest.update(f"v{CACHE_VERSION}\n".encode())
+    for f in sorted(Path(p) for p in files):
+        stat = f.stat()
+        digest.update(f"{f}|{stat.st_size}|{stat.st_mtime_ns}\n".encode())
+    return digest.hexdigest()[:16]
+
+
+def _paths(key):
+    return {
+        "df": CACHE_DIR / f"{key}.parquet",
+        "schema": CACHE_DIR / f"{key}.schema.json",
+        "index": CACHE_DIR / f"{key}.faiss",
+        "texts": CACHE_DIR / f"{key}.texts.json",
+    }
+
+
+def load(key):
+    """
+    Returns (df, schema, vectorstore) for a cache key, or None on a miss.
+    vectorstore is None if the index was not cached (e.g. embedding failed).
+    """
+    paths = _paths(key)
+    if not (paths["df"].exists() and paths["schema"].exists()):
+        return None
+
+    try:
+        df = pd.read_parquet(paths["df"], dtype_backend="pyarrow")
+        with open(paths["schema"], "r", encoding="utf-8") as f:
+            schema = json.load(f)
+
+        vectorstore = None
+        if paths["index"].exists() and paths["texts"].exists():
+            vectorstore = VectorStore.load(paths["index"], paths["texts"])
+
+        return df, schema, vectorstore
+    except Exception as e:
+        print(f"⚠️ Ignoring unreadable RAG cache: {str(e)}")
+        return None
+
+
+def save(key, df, schema, vectorstore=None):
+    """Best-effort write; stale entries for other keys are removed"""
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    paths = _paths(key)
+
+    try:
+        df.to_parquet(paths["df"])
+        with open(paths["schema"], "w", encoding="utf-8") as f:
+            json.dump(schema, f)
+        if vectorstore is not None:
+            vectorstore.save(paths["index"], paths["texts"])
+    except Exception as e:
+        print(f"⚠️ Could not write RAG cache: {str(e)}")
+        for path in paths.values():
+            path.unlink(missing_ok=True)
+        return
+
+    for path in CACHE_DIR.iterdir():
+        if not path.name.startswith(key):
+            path.unlink(missing_ok=True)
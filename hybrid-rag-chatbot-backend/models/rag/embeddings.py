@@ -1,7 +1,9 @@
 import vertexai
 from vertexai.language_models import TextEmbeddingModel
+import asyncio
 import os
 from dotenv import load_dotenv
+from google.api_core.exceptions import ResourceExhausted
 
 load_dotenv()
 
@@ -27,3 +29,77 @@ def embed(texts):
     embeddings = embedding_model.get_embeddings(texts)
 
     return [e.values for e in embeddings]
+
+
+# -----------------------------
+# Async micro-batching
+# -----------------------------
+# Concurrent aembed() calls arriving within BATCH_WINDOW seconds are sent
+# as one get_embeddings RPC (Vertex accepts up to MAX_BATCH_SIZE texts)
+BATCH_WINDOW = 0.005
+MAX_BATCH_SIZE = 250
+
+_pending = []
+_flush_task = None
+
+
+async def aembed(text):
+    """
+    Embeds a single string, coalescing concurrent callers
+    into batched Vertex AI requests
+    """
+
+    global _flush_task
+
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+    _pending.append((text, future))
+
+    if _flush_task is None:
+        _flush_task = loop.create_task(_flush_pending())
+
+    return await future
+
+
+async def _flush_pending():
+    global _flush_task
+
+    await asyncio.sleep(BATCH_WINDOW)
+
+    batch = _pending[:]
+    _pending.clear()
+    _flush_task = None
+
+    # Identical texts anywhere in the flush are embedded once
+    waiters = {}
+    for text, future in batch:
+        waiters.setdefault(text, []).append(future)
+    unique_texts = list(waiters)
+
+    # Oversized flushes (e.g. a full rebuild) go out as concurrent RPCs
+    await asyncio.gather(*(
+        _embed_batch(unique_texts[start:start + MAX_BATCH_SIZE], waiters)
+        for start in range(0, len(unique_texts), MAX_BATCH_SIZE)
+    ))
+
+
+async def _embed_batch(texts, waiters):
+    try:
+        vectors = await asyncio.to_thread(embed, texts)
+    except Exception as e:
+        if len(texts) > 1 and not isinstance(e, ResourceExhausted):
+            # Maybe one text was rejected: retry each on its own so it
+            # doesn't fail every caller coalesced into the same batch
+            await asyncio.gather(*(_embed_batch([text], waiters) for text in texts))
+            return
+
+        for text in texts:
+            for future in waiters[text]:
+                if not future.done():
+                    future.set_exception(e)
+        return
+
+    for text, vector in zip(texts, vectors):
+        for future in waiters[text]:
+            if not future.done():
+                future.set_result(vector)
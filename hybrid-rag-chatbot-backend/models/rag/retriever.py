@@ -1,9 +1,26 @@
-from models.rag.embeddings import embed
+from collections import OrderedDict
+from models.rag.embeddings import aembed
+
+# Distinct questions kept per retriever
+CONTEXT_CACHE_SIZE = 1024
 
 class Retriever:
     def __init__(self, vectorstore):
         self.vectorstore = vectorstore
+        # Per-instance LRU: a rebuilt vectorstore always gets a new Retriever
+        self._cache = OrderedDict()
+
+    async def get_context(self, question):
+        key = question.strip().lower()
+
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+
+        q_emb = await aembed(key)
+        context = self.vectorstore.search(q_emb)
 
-    def get_context(self, question):
-        q_emb = embed([question])[0]
-        return self.vectorstore.search(q_emb)
+        self._cache[key] = context
+        if len(self._cache) > CONTEXT_CACHE_SIZE:
+            self._cache.popitem(last=False)
+        return context
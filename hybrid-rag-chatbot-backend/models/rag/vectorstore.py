@@ -1,13 +1,67 @@
+import json
 import faiss
 import numpy as np
 
+# HNSW graph parameters
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 64
+HNSW_EF_SEARCH = 64
+
+# Product quantization for large corpora: PQ_M codes of PQ_NBITS each per vector
+PQ_M = 48
+PQ_NBITS = 8
+# PQ needs enough vectors to train its codebooks; smaller corpora use fp16
+PQ_MIN_DOCS = 39 * (1 << PQ_NBITS)
+
+
+def _build_index(dim, n_docs):
+    # Vectors are unit-length, so L2 ranking == cosine ranking for the PQ index
+    if n_docs >= PQ_MIN_DOCS and dim % PQ_M == 0:
+        return faiss.IndexHNSWPQ(dim, PQ_M, HNSW_M, PQ_NBITS)
+    # Cosine similarity = inner product over unit-length vectors,
+    # stored as fp16 (half the memory, no training needed)
+    return faiss.IndexHNSWSQ(
+        dim, faiss.ScalarQuantizer.QT_fp16, HNSW_M, faiss.METRIC_INNER_PRODUCT
+    )
+
+
 class VectorStore:
     def __init__(self, embeddings, texts):
         self.texts = texts
         dim = len(embeddings[0])
-        self.index = faiss.IndexFlatL2(dim)
-        self.index.add(np.array(embeddings).astype("float32"))
+
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        faiss.normalize_L2(vectors)
+        # Reused query buffer, so search() doesn't allocate per call
+        self._q_buf = np.empty((1, dim), dtype=np.float32)
+
+        self.index = _build_index(dim, len(vectors))
+        self.index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+        self.index.hnsw.efSearch = HNSW_EF_SEARCH
+
+        if not self.index.is_trained:
+            self.index.train(vectors)
+        self.index.add(vectors)
+
+    @classmethod
+    def load(cls, index_path, texts_path):
+        store = cls.__new__(cls)
+        store.index = faiss.read_index(str(index_path))
+        store.index.hnsw.efSearch = HNSW_EF_SEARCH
+        store._q_buf = np.empty((1, store.index.d), dtype=np.float32)
+        with open(texts_path, "r", encoding="utf-8") as f:
+            store.texts = json.load(f)
+        return store
+
+    def save(self, index_path, texts_path):
+        faiss.write_index(self.index, str(index_path))
+        with open(texts_path, "w", encoding="utf-8") as f:
+            json.dump(self.texts, f)
 
     def search(self, query_embedding, k=5):
-        D, I = self.index.search(np.array([query_embedding]).astype("float32"), k)
-        return [self.texts[i] for i in I[0]]
+        query = self._q_buf
+        np.copyto(query[0], np.asarray(query_embedding, dtype=np.float32))
+        faiss.normalize_L2(query)
+        D, I = self.index.search(query, k)
+        # FAISS pads with -1 when fewer than k docs exist
+        return [self.texts[i] for i in I[0] if i != -1]
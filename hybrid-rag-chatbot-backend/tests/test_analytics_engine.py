@@ -0,0 +1,107 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import models.core.analytics_engine as analytics_engine
+from models.core.analytics_engine import AnalyticsEngine, NUMBA_MIN_ROWS, POLARS_MIN_ROWS
+from models.data.loader import merge_frames
+
+SCHEMA = {"region": "Region", "product": "Product", "cost": "Cost", "qty": "Qty"}
+
+
+@pytest.fixture(scope="module")
+def df():
+    rng = np.random.default_rng(0)
+    n = max(NUMBA_MIN_ROWS, POLARS_MIN_ROWS) * 2
+    return pd.DataFrame({
+        "Region": rng.choice(["North", "South", "East", None], n),
+        "Product": rng.choice(["Bolt", "nut", "Washer"], n),
+        "Cost": np.where(rng.random(n) < 0.1, np.nan, rng.normal(100, 10, n)),
+        "Qty": rng.integers(0, 10, n),
+    })
+
+
+@pytest.fixture(scope="module")
+def engines(df):
+    """(pandas-only engine, engine with the numba + Polars fast paths)"""
+    return AnalyticsEngine(df, SCHEMA, fast_paths=False), AnalyticsEngine(df, SCHEMA)
+
+
+def _same(a, b):
+    if isinstance(a, dict):
+        return a.keys() == b.keys() and all(_same(a[k], b[k]) for k in a)
+    if isinstance(a, float) and math.isnan(a):
+        return isinstance(b, float) and math.isnan(b)
+    return a == pytest.approx(b)
+
+
+AGGS = [("sum", "cost"), ("avg", "cost"), ("max", "qty"), ("min", "qty"),
+        ("count_unique", "product"), ("max", "product")]
+
+PLANS = (
+    [[{"op": "groupby", "column": "region"}, {"op": op, "metric": m}] for op, m in AGGS]
+    + [[{"op": "filter", "column": "product", "value": "NUT"},
+        {"op": "groupby", "column": "region"},
+        {"op": op, "metric": m},
+        {"op": "sort", "order": "desc"},
+        {"op": "limit", "value": 2}] for op, m in AGGS]
+    + [[{"op": "filter", "column": "region", "value": "north"},
+        {"op": op, "metric": m}] for op, m in AGGS]
+    + [[{"op": "filter", "column": "region", "value": "west"},
+        {"op": op, "metric": m}] for op, m in AGGS]
+)
+
+
+@pytest.mark.parametrize("steps", PLANS)
+def test_fast_paths_match_pandas(engines, steps):
+    baseline, fast = engines
+    plan = {"type": "analytics", "steps": steps}
+    assert _same(fast.run(plan), baseline.run(plan))
+
+
+def test_baseline_never_takes_a_fast_path(engines, monkeypatch):
+    baseline, _ = engines
+    assert baseline._lf is None
+
+    def spy(*args):
+        raise AssertionError("numba kernel called by the pandas-only engine")
+
+    monkeypatch.setattr(analytics_engine, "group_reduce", spy)
+    for steps in PLANS:
+        baseline.run({"type": "analytics", "steps": steps})
+
+
+def test_numba_path_is_used(engines):
+    _, fast = engines
+    grouped = fast._groupby(fast.df, "Region")
+    assert fast._fast_group_agg(grouped, "Region", "Cost", "avg") is not None
+
+
+def test_polars_path_is_used(engines):
+    _, fast = engines
+    assert fast._lf is not None
+    steps = [{"op": "filter", "column": "product", "value": "bolt"},
+             {"op": "groupby", "column": "region"},
+             {"op": "sum", "metric": "qty"}]
+    assert fast._run_polars(steps) is not None
+    # Unfiltered plans stay on pandas
+    assert fast._run_polars(steps[1:]) is None
+
+
+@pytest.mark.parametrize("op", ["avg", "max", "min"])
+def test_empty_filter_on_arrow_dtypes(op):
+    # Small frame: below both fast-path thresholds, so pandas handles it
+    frame = merge_frames([pd.DataFrame({
+        "Region": ["North", "South", "North", "East"],
+        "Cost": [1.5, 2.0, None, 4.25],
+    })])
+    assert str(frame["Cost"].dtype) == "double[pyarrow]"
+
+    engine = AnalyticsEngine(frame, {"region": "Region", "cost": "Cost"})
+    result = engine.run({"type": "analytics", "steps": [
+        {"op": "filter", "column": "region", "value": "west"},
+        {"op": op, "metric": "cost"},
+    ]})
+    assert isinstance(result, float) and math.isnan(result)
@@ -0,0 +1,30 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from models.data.loader import merge_frames
+from models.rag import cache
+from models.rag.vectorstore import VectorStore
+
+
+def test_mixed_type_column_round_trips(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, "CACHE_DIR", tmp_path)
+
+    df = merge_frames([pd.DataFrame({
+        "Code": ["A1", 123, None, 4.5],
+        "Cost": [1.5, 2.0, None, 4.25],
+    })])
+    # Same Arrow string dtype convert_dtypes gives pure-string columns
+    assert df["Code"].dtype == pd.ArrowDtype(pa.string())
+    assert df["Code"].isna().tolist() == [False, False, True, False]
+
+    rng = np.random.default_rng(0)
+    store = VectorStore(rng.normal(size=(3, 8)).tolist(), ["a", "b", "c"])
+    cache.save("k", df, {"code": "Code", "cost": "Cost"}, store)
+
+    loaded = cache.load("k")
+    assert loaded is not None
+    loaded_df, schema, loaded_store = loaded
+    pd.testing.assert_frame_equal(loaded_df, df)
+    assert schema == {"code": "Code", "cost": "Cost"}
+    assert loaded_store is not None and loaded_store.texts == ["a", "b", "c"]
@@ -0,0 +1,26 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from models.core.kernels import GROUP_OPS, group_reduce
+
+PANDAS_OPS = {"sum": "sum", "avg": "mean", "max": "max", "min": "min"}
+
+
+@pytest.mark.parametrize("op", GROUP_OPS)
+def test_group_reduce_matches_pandas(op):
+    rng = np.random.default_rng(1)
+    n = 5_000
+    values = np.where(rng.random(n) < 0.2, np.nan, rng.normal(size=n))
+    # -1 = missing key, group 3 only ever sees NaN
+    codes = rng.integers(-1, 3, n)
+    codes[:10] = 3
+    values[codes == 3] = np.nan
+
+    out = group_reduce(values, codes, 4, GROUP_OPS[op])
+
+    keep = codes >= 0
+    expected = getattr(
+        pd.Series(values[keep]).groupby(codes[keep]), PANDAS_OPS[op]
+    )().reindex(range(4))
+    np.testing.assert_allclose(out, expected.to_numpy(), equal_nan=True)
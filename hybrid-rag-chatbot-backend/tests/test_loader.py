@@ -0,0 +1,23 @@
+import pandas as pd
+
+from models.data import loader
+
+
+def test_calamine_matches_openpyxl(tmp_path, monkeypatch):
+    assert loader.EXCEL_ENGINE == "calamine"
+
+    path = tmp_path / "data.xlsx"
+    frame = pd.DataFrame({
+        "Vendor": ["Acme", "Bolt Co", None],
+        "Cost": [1.5, None, 3.25],
+        "Qty": [1, 2, 3],
+    })
+    with pd.ExcelWriter(path) as writer:
+        frame.to_excel(writer, sheet_name="Sheet A", index=False)
+        frame.to_excel(writer, sheet_name="Sheet B", index=False)
+
+    fast = [loader.parse_sheet(path, s) for s in loader.list_sheets(path)]
+    monkeypatch.setattr(loader, "EXCEL_ENGINE", None)
+    slow = [loader.parse_sheet(path, s) for s in loader.list_sheets(path)]
+
+    pd.testing.assert_frame_equal(loader.merge_frames(fast), loader.merge_frames(slow))
@@ -183,25 +183,55 @@ const Mainpage: React.FC = () => {
     }));
   };
 
+  // Handle updating a message locally (e.g. while it streams in)
+  const handleUpdateMessageLocally = (chatId: string, messageId: string, updates: Partial<Message>) => {
+    setChatMessages(prev => ({
+      ...prev,
+      [chatId]: (prev[chatId] || []).map(msg =>
+        msg.id === messageId ? { ...msg, ...updates } : msg
+      )
+    }));
+  };
+
   // Handle sending message to backend
   const handleSendMessage = async (chatId: string, userMessage: string): Promise<void> => {
     try {
       setLoading(true);
       console.log('📤 Sending message to backend:', chatId, userMessage);
 
-      // Send to backend and get bot response
-      const response = await api.sendMessage(chatId, userMessage);
-      console.log('✅ Received bot response:', response);
+      // Stream the bot response into a message that grows as tokens arrive
+      const streamingId = `bot_${Date.now()}`;
+      let content = '';
       
-      // Add bot response
-      const botMsg: Message = {
-        id: response.message_id || `bot_${Date.now()}`,
-        type: 'bot',
-        content: response.content,
-        timestamp: new Date(response.timestamp || new Date()),
-      };
+      const response = await api.streamMessage(chatId, userMessage, (token) => {
+        content += token;
+        if (content === token) {
+          // First chunk: show the bot message
+          setLoading(false);
+          handleAddMessageLocally(chatId, {
+            id: streamingId,
+            type: 'bot',
+            content,
+            timestamp: new Date(),
+          });
+        } else {
+          handleUpdateMessageLocally(chatId, streamingId, { content });
+        }
+      });
+      console.log('✅ Received bot response:', response);
       
-      handleAddMessageLocally(chatId, botMsg);
+      // Final text + the ID the backend stored it under
+      const finalId = response.message_id || streamingId;
+      if (content) {
+        handleUpdateMessageLocally(chatId, streamingId, { id: finalId, content: response.content });
+      } else {
+        handleAddMessageLocally(chatId, {
+          id: finalId,
+          type: 'bot',
+          content: response.content,
+          timestamp: new Date(),
+        });
+      }
       
       setLoading(false);
     } catch (error) {
@@ -108,6 +108,48 @@ export const sendMessage = async (chatId: string, message: string) => {
     return await response.json();
 };
 
+// Send message and stream the bot response as it is generated.
+// onToken receives each chunk of text as soon as it arrives.
+export const streamMessage = async (
+    chatId: string,
+    message: string,
+    onToken: (text: string) => void
+) => {
+    const response = await fetch(`${API_BASE_URL}/chat/message/stream`, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({
+            chat_id: chatId,
+            message: message,
+        }),
+    });
+
+    if (!response.ok || !response.body) {
+        throw new Error('Failed to send message');
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let content = '';
+
+    while (true) {
+        const { done, value } = await reader.read();
+        const text = done ? decoder.decode() : decoder.decode(value, { stream: true });
+        if (text) {
+            content += text;
+            onToken(text);
+        }
+        if (done) break;
+    }
+
+    return {
+        message_id: response.headers.get('X-Message-Id'),
+        content: content.trim(),
+    };
+};
+
 // Save message manually
 export const saveMessage = async (messageId: string, chatId: string, type: 'user' | 'bot', content: string) => {
     const response = await fetch(`${API_BASE_URL}/chat/message/save`, {